@@ -0,0 +1,106 @@
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def get_key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def purge_expired_keys():
+    return IdempotencyKey.objects.filter(created_at__lt=timezone.now() - get_key_ttl()).delete()[0]
+
+
+def hash_request(request):
+    # Fingerprint of the method and body. Multipart bodies are hashed by their fields and
+    # file contents: the boundary changes between retries and the files may not fit in memory.
+    digest = hashlib.sha256(request.method.encode())
+    if request.content_type == 'multipart/form-data':
+        for name, values in sorted(request.POST.lists()):
+            digest.update(repr((name, values)).encode())
+        for name, files in sorted(request.FILES.lists()):
+            for file in files:
+                digest.update(repr((name, file.size)).encode())
+                for chunk in file.chunks():
+                    digest.update(chunk)
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim_key(key, path, request_hash):
+    # Insert the key or return the stored record for it. Must run inside a transaction:
+    # a concurrent request with the same key blocks on the unique index until we commit.
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(key=key, path=path, request_hash=request_hash)
+            return None
+        except IntegrityError:
+            record = IdempotencyKey.objects.select_for_update().filter(key=key, path=path).first()
+            if record is None:
+                continue
+            if record.created_at < timezone.now() - get_key_ttl():
+                record.delete()
+                continue
+            return record
+    raise IntegrityError(f'Could not claim idempotency key {key!r}')
+
+
+def replay_response(record, request_hash):
+    # The key is claimed and its response stored in one transaction, and server errors
+    # roll the claim back, so a committed record always holds a response to replay.
+    # Keys stored before request hashes were recorded have none to compare.
+    if record.request_hash and record.request_hash != request_hash:
+        return JsonResponse(
+            {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'}, status=422
+        )
+    response = HttpResponse(
+        bytes(record.response_body or b''), status=record.status_code, content_type=record.content_type
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Replay the stored response when a request repeats an Idempotency-Key within the TTL."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'error': f'{IDEMPOTENCY_HEADER} is too long'}, status=400)
+
+        request_hash = hash_request(request)
+        with transaction.atomic():
+            record = claim_key(key, request.path, request_hash)
+            if record is not None:
+                return replay_response(record, request_hash)
+
+            response = view(request, *args, **kwargs)
+
+            # Server errors are not stored so the client can retry them
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+
+            IdempotencyKey.objects.filter(key=key, path=request.path).update(
+                status_code=response.status_code,
+                content_type=response.get('Content-Type', ''),
+                response_body=response.content,
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,157 @@
+import copy
+import datetime
+import os
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from database_api.models import Order
+from database_api.pdf import render_order_pdf, render_orders_pdf
+from database_api.signatures import hash_path
+
+
+def draw_legacy_page(p, order):
+    # The per-call drawString code generate_order_pdf used before database_api.pdf,
+    # kept only as a baseline (it truncates observations to 100 characters)
+    width, height = A4
+    p.setFont("Helvetica-Bold", 24)
+    p.drawString(1*inch, height - 0.8*inch, "INFORME DE PEDIDO")
+    p.line(1*inch, height - 0.9*inch, width - 1*inch, height - 0.9*inch)
+    p.setFont("Helvetica", 14)
+    p.drawString(1*inch, height - 1.2*inch, f"Pedido #{order.id}")
+    p.setFont("Helvetica", 12)
+    y = height - 1.6*inch
+    p.drawString(1*inch, y, f"Fecha: {order.date.strftime('%d-%m-%Y')}")
+    y -= 0.3*inch
+    p.drawString(1*inch, y, f"Estado: {order.get_status_display()}")
+    y -= 0.5*inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1*inch, y, "Información del Cliente")
+    y -= 0.3*inch
+    p.setFont("Helvetica", 12)
+    p.drawString(1*inch, y, f"Nombre: {order.customer_name}")
+    y -= 0.25*inch
+    p.drawString(1*inch, y, f"Teléfono: {order.customer_phone}")
+    y -= 0.5*inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1*inch, y, "Información del Destinatario")
+    y -= 0.3*inch
+    p.setFont("Helvetica", 12)
+    p.drawString(1*inch, y, f"Nombre: {order.receiver_name}")
+    y -= 0.25*inch
+    p.drawString(1*inch, y, f"Teléfono: {order.receiver_phone}")
+    y -= 0.25*inch
+    p.drawString(1*inch, y, f"Dirección: {order.address}")
+    y -= 0.5*inch
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(1*inch, y, "Producto")
+    y -= 0.3*inch
+    p.setFont("Helvetica", 12)
+    p.drawString(1*inch, y, f"{order.product_name}")
+    y -= 0.5*inch
+    if order.observations:
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(1*inch, y, "Observaciones")
+        y -= 0.3*inch
+        p.setFont("Helvetica", 12)
+        p.drawString(1*inch, y, order.observations[:100])
+        y -= 0.5*inch
+    if order.signature:
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(1*inch, y, "Firma del Cliente")
+        y -= 0.3*inch
+        p.drawImage(order.signature.path, 1*inch, y - 2*inch, width=3*inch, height=1.5*inch)
+    p.showPage()
+
+
+def render_legacy_pdf(orders, output):
+    # Run with ReportLab's default ASCII85 streams, as the old code did
+    use_a85 = rl_config.useA85
+    rl_config.useA85 = 1
+    try:
+        p = canvas.Canvas(output, pagesize=A4)
+        for order in orders:
+            draw_legacy_page(p, order)
+        p.save()
+    finally:
+        rl_config.useA85 = use_a85
+    return output
+
+
+class Command(BaseCommand):
+    help = 'Measure per-PDF CPU time of the order sheet renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='Orders rendered per measurement')
+        parser.add_argument(
+            '--observations-length', type=int, default=80,
+            help='Length of the observations text, raise it to exercise multi-page layout'
+        )
+        parser.add_argument(
+            '--signature', default='signatures/signature_nfzvzIr.png',
+            help='Signature file under MEDIA_ROOT used for the signed order, empty to skip'
+        )
+
+    def handle(self, *args, **options):
+        count = max(options['count'], 1)
+        length = options['observations_length']
+        observations = ('Llamar antes de entregar. ' * (length // 26 + 1))[:length]
+        order = Order(
+            id=1,
+            date=datetime.date(2025, 11, 25),
+            customer_name='Juan Pérez',
+            customer_phone=612345678,
+            receiver_name='María García',
+            receiver_phone=698765432,
+            product_name='Laptop Dell XPS 15',
+            address='Calle Mayor 45, 3º B, 28013 Madrid',
+            observations=observations,
+        )
+        scenarios = [('unsigned', order)]
+        if options['signature']:
+            signed = copy.copy(order)
+            signed.signature = options['signature']
+            if os.path.exists(signed.signature.path):
+                # Stored hash and cached print image, as for any order after its first download
+                signed.signature_hash = hash_path(signed.signature.path)
+                render_order_pdf(signed, BytesIO())
+                scenarios.append(('signed', signed))
+            else:
+                self.stderr.write(f'Signature {signed.signature.path} not found, skipping signed order')
+
+        # Both renderers are timed the same way: one document per order, and all orders in one document
+        for label, sample in scenarios:
+            orders = [sample] * count
+            timings = {
+                'legacy, single': self.cpu_time(lambda: [render_legacy_pdf([o], BytesIO()) for o in orders]),
+                'renderer, single': self.cpu_time(lambda: [render_order_pdf(o, BytesIO()) for o in orders]),
+                'legacy, batch': self.cpu_time(lambda: render_legacy_pdf(orders, BytesIO())),
+                'renderer, batch': self.cpu_time(lambda: render_orders_pdf(orders, BytesIO())),
+            }
+            sizes = (
+                len(render_legacy_pdf([sample], BytesIO()).getvalue()),
+                len(render_order_pdf(sample, BytesIO()).getvalue()),
+            )
+            self.stdout.write(f'{label} order, {sizes[0]} vs {sizes[1]} bytes per single PDF (legacy vs renderer)')
+            for name, total in timings.items():
+                self.stdout.write(f'  {name:<18} {total / count * 1000:.2f} ms/order')
+
+        pages = render_order_pdf(order, BytesIO()).getvalue().count(b'/Type /Page\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} orders, observations {length} chars, {pages} page(s) per order'
+        ))
+
+    def cpu_time(self, func, repeat=3):
+        # Best of a few runs, the sandbox timings are noisy
+        best = None
+        for _ in range(repeat):
+            start = time.process_time()
+            func()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,65 @@
+import time
+
+from django.db import transaction
+from django.http import JsonResponse
+from django.core.management.base import BaseCommand
+
+from database_api.models import Order
+from database_api.serializers import json_response, orjson, serialize_orders
+
+
+class Command(BaseCommand):
+    help = 'Compare order JSON serialization against the previous JsonResponse(list(values())) path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of orders to serialize')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path, the best one is reported')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = max(options['repeat'], 1)
+
+        # Work inside a transaction that is always rolled back
+        with transaction.atomic():
+            Order.objects.bulk_create(
+                [
+                    Order(
+                        date='2025-11-25',
+                        customer_name=f'Cliente {i}',
+                        customer_phone=612345678,
+                        receiver_name=f'Destinatario {i}',
+                        receiver_phone=698765432,
+                        product_name='Producto',
+                        address=f'Calle Mayor {i}, 28013 Madrid',
+                        observations='Llamar antes de entregar',
+                        signature=f'signatures/signature_{i}.png' if i % 2 else None,
+                    )
+                    for i in range(rows)
+                ],
+                batch_size=5000,
+            )
+            orders = Order.objects.all()
+
+            def values_path():
+                return JsonResponse({'orders': list(orders.values())}).content
+
+            def serializer_path():
+                return json_response({'orders': serialize_orders(orders)}).content
+
+            results = []
+            for name, func in (('values() + JsonResponse', values_path), ('serializers', serializer_path)):
+                best = min(self.time_call(func) for _ in range(repeat))
+                results.append(best)
+                self.stdout.write(f'{name:<26} {best:.3f}s')
+
+            transaction.set_rollback(True)
+
+        encoder = 'orjson' if orjson is not None else 'json'
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} rows, encoder {encoder}: {results[0] / results[1]:.2f}x speedup'
+        ))
+
+    def time_call(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,80 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from database_api.models import Order
+from database_api.signatures import THUMBNAIL_DIR
+
+
+class Command(BaseCommand):
+    help = 'Remove signature files and thumbnails that are no longer referenced by any order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report orphaned files, do not delete them')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of files checked per query')
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Skip files modified less than this many seconds ago (uploads still in flight)'
+        )
+
+    def handle(self, *args, **options):
+        field = Order._meta.get_field('signature')
+        self.storage = field.storage
+        upload_to = field.upload_to.strip('/')
+        directory = self.storage.path(upload_to)
+
+        if not os.path.isdir(directory):
+            self.stdout.write(f'Directory {directory} does not exist, nothing to do')
+            return
+
+        self.dry_run = options['dry_run']
+        self.batch_size = max(options['batch_size'], 1)
+        self.cutoff = time.time() - options['min_age']
+        self.scanned = self.orphaned = self.freed = 0
+
+        # Signatures are referenced by their stored name
+        self.clean_directory(upload_to, 'signature', lambda name: f'{upload_to}/{name}')
+        # Thumbnails and PDF images are named "<content hash>_<variant>.<ext>"
+        thumbnails = f'{upload_to}/{THUMBNAIL_DIR}'
+        if os.path.isdir(self.storage.path(thumbnails)):
+            self.clean_directory(thumbnails, 'signature_hash', lambda name: name.split('_', 1)[0])
+
+        action = 'Would remove' if self.dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {self.scanned} files. {action} {self.orphaned} orphaned files ({self.freed} bytes).'
+        ))
+
+    def clean_directory(self, relative_dir, lookup_field, reference_for):
+        batch = {}
+
+        def flush():
+            references = {reference_for(entry.name) for entry in batch.values()}
+            referenced = set(
+                Order.objects.filter(**{f'{lookup_field}__in': references}).values_list(lookup_field, flat=True)
+            )
+            for name, entry in batch.items():
+                if reference_for(entry.name) in referenced:
+                    continue
+                size = entry.stat().st_size
+                self.orphaned += 1
+                self.freed += size
+                if self.dry_run:
+                    self.stdout.write(f'Orphaned: {name} ({size} bytes)')
+                else:
+                    self.storage.delete(name)
+            batch.clear()
+
+        # Stream the directory instead of listing it in memory
+        with os.scandir(self.storage.path(relative_dir)) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                self.scanned += 1
+                if entry.stat().st_mtime > self.cutoff:
+                    continue
+                batch[f'{relative_dir}/{entry.name}'] = entry
+                if len(batch) >= self.batch_size:
+                    flush()
+        if batch:
+            flush()
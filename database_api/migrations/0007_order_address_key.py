@@ -0,0 +1,144 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:27
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copy of database_api.addresses as of this migration, so later changes to the
+# live parser don't change what this backfill computes
+
+POSTAL_CODE_RE = re.compile(r'\b(\d{5})\b')
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STREET_ABBREVIATIONS = {
+    'c': 'calle',
+    'cl': 'calle',
+    'av': 'avenida',
+    'avda': 'avenida',
+    'pza': 'plaza',
+    'pl': 'plaza',
+    'po': 'paseo',
+    'ctra': 'carretera',
+    'rda': 'ronda',
+    'trav': 'travesia',
+}
+
+STREET_STOPWORDS = {'de', 'del', 'la', 'las', 'el', 'los', 'y', 'n', 'no', 'num', 'numero', 's', 'sn'}
+
+KEY_SEPARATOR = '|'
+
+
+def strip_accents(value):
+    normalized = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def normalize_tokens(value):
+    tokens = TOKEN_RE.findall(strip_accents(value.lower()))
+    return [STREET_ABBREVIATIONS.get(token, token) for token in tokens]
+
+
+def is_city(value):
+    # Town names have letters and never digits, unlike house numbers, floors or postal codes
+    return any(char.isalpha() for char in value) and not any(char.isdigit() for char in value)
+
+
+def parse_address(address):
+    # Split a free-text address like "Calle Mayor 45, 3º B, 28013 Madrid"
+    # into (postal_code, city, street)
+    if not address:
+        return '', '', ''
+
+    parts = [part.strip() for part in address.replace('\n', ',').split(',') if part.strip()]
+    if not parts:
+        return '', '', ''
+
+    postal_code = ''
+    city = ''
+    used = set()
+    # Text around the postal code in its own segment, the street may share it
+    fragments = []
+    for index, part in enumerate(parts):
+        match = POSTAL_CODE_RE.search(part)
+        if not match:
+            continue
+        postal_code = match.group(1)
+        used.add(index)
+        before, after = part[:match.start()].strip(), part[match.end():].strip()
+        # City is what follows the postal code, the next segment, or what precedes the code
+        if is_city(after):
+            city = after
+            fragments = [before]
+        elif not after and index + 1 < len(parts) and is_city(parts[index + 1]):
+            city = parts[index + 1]
+            used.add(index + 1)
+            fragments = [before]
+        elif is_city(before):
+            city = before
+            fragments = [after]
+        else:
+            fragments = [before, after]
+        break
+    else:
+        # No postal code, a trailing segment without digits is the city
+        if len(parts) > 1 and is_city(parts[-1]):
+            city = parts[-1]
+            used.add(len(parts) - 1)
+
+    # Street is the first segment not holding the postal code or the city,
+    # falling back to the text next to the postal code
+    candidates = [part for index, part in enumerate(parts) if index not in used] + fragments
+    street_source = next((candidate for candidate in candidates if candidate), '')
+
+    # Drop the city when the street segment repeats it at the end, then numbers, floors and stopwords
+    tokens = normalize_tokens(street_source)
+    city_tokens = normalize_tokens(city)
+    if city_tokens and len(tokens) > len(city_tokens) and tokens[-len(city_tokens):] == city_tokens:
+        tokens = tokens[:-len(city_tokens)]
+    street_tokens = [
+        token for token in tokens
+        if not any(char.isdigit() for char in token) and token not in STREET_STOPWORDS
+    ]
+
+    return postal_code, ' '.join(city_tokens), ' '.join(street_tokens)
+
+
+def build_address_key(address):
+    return KEY_SEPARATOR.join(parse_address(address))
+
+
+def fill_address_keys(apps, schema_editor):
+    Order = apps.get_model('database_api', 'Order')
+    manager = Order.objects.using(schema_editor.connection.alias)
+    orders = manager.only('id', 'address')
+    batch = []
+    for order in orders.iterator(chunk_size=1000):
+        order.address_key = build_address_key(order.address)[:255]
+        batch.append(order)
+        if len(batch) >= 1000:
+            manager.bulk_update(batch, ['address_key'])
+            batch = []
+    if batch:
+        manager.bulk_update(batch, ['address_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_api', '0006_rename_comments_order_observations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='address_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='signature',
+            field=models.ImageField(blank=True, null=True, upload_to='signatures/'),
+        ),
+        migrations.RunPython(fill_address_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_api', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='signature_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
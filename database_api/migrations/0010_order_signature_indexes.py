@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_api', '0009_order_signature_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='signature',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='signatures/'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='signature_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+    ]
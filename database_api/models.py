@@ -1,5 +1,7 @@
 from django.db import models
 
+from .addresses import build_address_key
+
 class Order(models.Model):
     date = models.DateField()
     customer_name = models.CharField(max_length=255)
@@ -8,8 +10,13 @@ class Order(models.Model):
     receiver_phone = models.IntegerField(blank=True, null=True)
     product_name = models.CharField(max_length=255)
     address = models.TextField()
+    # Normalized "postal_code|city|street" key used to group orders by route
+    address_key = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
     observations = models.TextField(blank=True, null=True)
-    signature = models.ImageField(upload_to='signatures/', blank=True, null=True)
+    # Indexed for the "is this file still referenced" checks done on cleanup
+    signature = models.ImageField(upload_to='signatures/', blank=True, null=True, db_index=True)
+    # SHA-256 of the signature file, used for ETags and versioned image URLs
+    signature_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True)
 
     class Status(models.TextChoices):
         PENDING = 'pending'
@@ -18,3 +25,27 @@ class Order(models.Model):
         PROBLEMATIC = 'problematic'
 
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    def save(self, *args, **kwargs):
+        self.address_key = build_address_key(self.address)[:255]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'address' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'address_key'}
+        super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    # Response stored for a client supplied Idempotency-Key on a given endpoint
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    # SHA-256 of the request method and body, a reused key must come with the same request
+    request_hash = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    response_body = models.BinaryField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'path'], name='unique_idempotency_key_path'),
+        ]
@@ -0,0 +1,254 @@
+import functools
+import os
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .signatures import get_or_create_print_image, get_signature_hash
+
+# Write compressed streams as binary instead of ASCII85: the text encoding only matters
+# for 7-bit transports, makes every stream 25% larger and is the most expensive step
+# when embedding a signature image. This module is the only ReportLab user.
+rl_config.useA85 = 0
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 1 * inch
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+TITLE_FONT = ('Helvetica-Bold', 24)
+SUBTITLE_FONT = ('Helvetica', 14)
+HEADING_FONT = ('Helvetica-Bold', 14)
+BODY_FONT = ('Helvetica', 12)
+NOTE_FONT = ('Helvetica-Oblique', 10)
+
+LINE_HEIGHT = 0.25 * inch
+HEADING_HEIGHT = 0.3 * inch
+SECTION_GAP = 0.25 * inch
+# Body text starts below the title, rule and order number
+CONTENT_TOP = PAGE_HEIGHT - 1.6 * inch
+SIGNATURE_WIDTH = 3 * inch
+SIGNATURE_HEIGHT = 1.5 * inch
+SIGNATURE_BLOCK = 2 * inch
+
+SECTION_HEADINGS = {
+    'customer': 'Información del Cliente',
+    'receiver': 'Información del Destinatario',
+    'product': 'Producto',
+    'observations': 'Observaciones',
+    'signature': 'Firma del Cliente',
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def word_width(word, font):
+    return stringWidth(word, *font)
+
+
+def split_long_word(word, font):
+    # Break a word wider than the page into pieces that fit
+    pieces, piece, piece_width = [], '', 0
+    for char in word:
+        char_width = word_width(char, font)
+        if piece and piece_width + char_width > CONTENT_WIDTH:
+            pieces.append(piece)
+            piece, piece_width = '', 0
+        piece += char
+        piece_width += char_width
+    return pieces + [piece]
+
+
+def wrap_text(text, font):
+    # Keep explicit line breaks and greedily wrap each paragraph to the content width,
+    # summing cached word widths instead of re-measuring the growing line
+    space_width = word_width(' ', font)
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        if stringWidth(paragraph, *font) <= CONTENT_WIDTH:
+            lines.append(paragraph)
+            continue
+
+        line, line_width = [], 0
+        for word in paragraph.split():
+            width = word_width(word, font)
+            if width > CONTENT_WIDTH:
+                *full, word = split_long_word(word, font)
+                if line:
+                    lines.append(' '.join(line))
+                lines.extend(full)
+                line, line_width = [], 0
+                width = word_width(word, font)
+            elif line and line_width + space_width + width > CONTENT_WIDTH:
+                lines.append(' '.join(line))
+                line, line_width = [], 0
+            line_width += width + (space_width if line else 0)
+            line.append(word)
+        lines.append(' '.join(line))
+    return lines
+
+
+class Page:
+    # Positioned variable content of one page, lines are (font, y, text)
+    def __init__(self, continued):
+        self.continued = continued
+        self.lines = []
+        self.images = []
+
+
+class OrderSheetLayout:
+    """Place an order's content on as many pages as it needs, without drawing anything."""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.page = Page(continued=bool(self.pages))
+        self.pages.append(self.page)
+        self.y = CONTENT_TOP
+
+    def ensure_space(self, height):
+        if self.y - height < MARGIN:
+            self.new_page()
+
+    def add_lines(self, lines, font=BODY_FONT, line_height=LINE_HEIGHT):
+        for line in lines:
+            self.ensure_space(line_height)
+            self.page.lines.append((font, self.y, line))
+            self.y -= line_height
+
+    def add_heading(self, key, height_below):
+        # Never leave a heading alone at the bottom of a page
+        self.ensure_space(HEADING_HEIGHT + height_below)
+        self.page.lines.append((HEADING_FONT, self.y, SECTION_HEADINGS[key]))
+        self.y -= HEADING_HEIGHT
+
+    def add_section(self, key, values):
+        self.add_heading(key, LINE_HEIGHT)
+        self.add_lines([line for value in values for line in wrap_text(value, BODY_FONT)])
+        self.y -= SECTION_GAP
+
+    def add_signature(self, signature):
+        self.add_heading('signature', SIGNATURE_BLOCK)
+        # Handle both local and remote storage
+        if hasattr(signature, 'path') and os.path.exists(signature.path):
+            content_hash = get_signature_hash(signature.instance)
+            self.page.images.append((signature.path, content_hash, self.y - SIGNATURE_BLOCK))
+            self.y -= SIGNATURE_BLOCK
+        else:
+            self.y -= 0.5 * inch - LINE_HEIGHT
+            self.add_lines(['[Firma disponible en el sistema]'], NOTE_FONT)
+
+    def add_order(self, order):
+        date_str = order.date.strftime('%d-%m-%Y') if order.date else 'N/A'
+        self.add_lines(wrap_text(f'Fecha: {date_str}', BODY_FONT), line_height=0.3 * inch)
+        self.add_lines(wrap_text(f'Estado: {order.get_status_display()}', BODY_FONT))
+        self.y -= SECTION_GAP
+
+        customer_phone = f'{order.customer_phone}' if order.customer_phone else 'N/A'
+        self.add_section('customer', [
+            f'Nombre: {order.customer_name or "N/A"}',
+            f'Teléfono: {customer_phone}',
+        ])
+
+        receiver_phone = f'{order.receiver_phone}' if order.receiver_phone else 'N/A'
+        self.add_section('receiver', [
+            f'Nombre: {order.receiver_name}',
+            f'Teléfono: {receiver_phone}',
+            f'Dirección: {order.address}',
+        ])
+
+        self.add_section('product', [order.product_name or 'N/A'])
+
+        if order.observations:
+            self.add_section('observations', [order.observations])
+
+        if order.signature:
+            self.add_signature(order.signature)
+        return self.pages
+
+
+class OrderSheetRenderer:
+    """Draw laid out order sheets into a single PDF.
+
+    The fixed page header (title and rule line) is recorded once as a form XObject
+    and referenced by every page when the document has more than one page; a
+    one-page document draws it inline, since a form used once only adds an object.
+    Headings and order data go into one text object per page.
+    """
+
+    def __init__(self, output, share_header=False):
+        self.canvas = canvas.Canvas(output, pagesize=A4)
+        self.share_header = share_header
+        self.header_recorded = False
+
+    def save(self):
+        self.canvas.save()
+
+    def draw_header(self):
+        c = self.canvas
+        c.setFont(*TITLE_FONT)
+        c.drawString(MARGIN, PAGE_HEIGHT - 0.8 * inch, 'INFORME DE PEDIDO')
+        c.line(MARGIN, PAGE_HEIGHT - 0.9 * inch, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - 0.9 * inch)
+
+    def use_header(self):
+        if not self.share_header:
+            self.draw_header()
+            return
+        if not self.header_recorded:
+            self.canvas.beginForm('page-header')
+            self.draw_header()
+            self.canvas.endForm()
+            self.header_recorded = True
+        self.canvas.doForm('page-header')
+
+    def draw_page(self, order, page):
+        c = self.canvas
+        self.use_header()
+
+        # All variable text goes into one text object, grouped so each font is selected once.
+        # Consecutive lines are emitted with T* (next line by leading) instead of a full text matrix.
+        text = c.beginText()
+        text.setFont(*SUBTITLE_FONT, leading=LINE_HEIGHT)
+        suffix = ' (continuación)' if page.continued else ''
+        text.setTextOrigin(MARGIN, PAGE_HEIGHT - 1.2 * inch)
+        text.textLine(f'Pedido #{order.id}{suffix}')
+        for font in (HEADING_FONT, BODY_FONT, NOTE_FONT):
+            lines = [(y, line) for line_font, y, line in page.lines if line_font == font]
+            if lines:
+                text.setFont(*font, leading=LINE_HEIGHT)
+            cursor = None
+            for y, line in lines:
+                if cursor is None or abs(cursor - y) > 0.01:
+                    text.setTextOrigin(MARGIN, y)
+                text.textLine(line)
+                cursor = y - LINE_HEIGHT
+        c.drawText(text)
+
+        for path, content_hash, y in page.images:
+            try:
+                image = get_or_create_print_image(path, content_hash)
+                c.drawImage(image, MARGIN, y, width=SIGNATURE_WIDTH, height=SIGNATURE_HEIGHT)
+            except Exception as e:
+                # Handle any image loading errors
+                c.setFont(*NOTE_FONT)
+                c.drawString(MARGIN, y + SIGNATURE_BLOCK - 0.5 * inch, f'[Error cargando firma: {str(e)}]')
+
+        c.showPage()
+
+
+def render_orders_pdf(orders, output):
+    # Lay everything out first so the renderer knows whether a shared header pays off
+    sheets = [(order, OrderSheetLayout().add_order(order)) for order in orders]
+    renderer = OrderSheetRenderer(output, share_header=sum(len(pages) for _, pages in sheets) > 1)
+    for order, pages in sheets:
+        for page in pages:
+            renderer.draw_page(order, page)
+    renderer.save()
+    return output
+
+
+def render_order_pdf(order, output):
+    return render_orders_pdf([order], output)
@@ -0,0 +1,112 @@
+import contextvars
+import functools
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError, OperationalError
+
+# Alias chosen for reads during the current request, None means primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+# Replica health is checked at most once per this many seconds per process
+REPLICA_CHECK_INTERVAL = 5
+_replica_status = {'alias': None, 'available': False, 'checked_at': 0.0}
+
+
+class ReplicaRouter:
+    """Send reads marked with @read_from_replica to the replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica and primary hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def get_replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    if alias and alias in settings.DATABASES and alias != DEFAULT_DB_ALIAS:
+        return alias
+    return None
+
+
+def replica_available(alias):
+    # Cache the result so an unreachable replica doesn't cost a connect attempt per request
+    now = time.monotonic()
+    if _replica_status['alias'] == alias and now - _replica_status['checked_at'] < REPLICA_CHECK_INTERVAL:
+        return _replica_status['available']
+
+    connection = connections[alias]
+    try:
+        # SQLite would silently create an empty file instead of failing
+        if connection.vendor == 'sqlite' and not os.path.exists(connection.settings_dict['NAME']):
+            available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            available = True
+    except DatabaseError:
+        available = False
+        connection.close()
+
+    _replica_status.update(alias=alias, available=available, checked_at=now)
+    return available
+
+
+def get_client_key(request):
+    # Identify the client behind a proxy by the first forwarded address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    client = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR', '')
+    return f'primary-pin:{client}'
+
+
+def client_recently_wrote(request):
+    return cache.get(get_client_key(request)) is not None
+
+
+def read_from_replica(view):
+    """Run the view's reads on the replica unless the client just wrote or the replica is down."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = get_replica_alias()
+        if alias is None or client_recently_wrote(request) or not replica_available(alias):
+            return view(request, *args, **kwargs)
+
+        token = _read_alias.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        except OperationalError:
+            # The replica failed since its last health check, these views only read so
+            # mark it down and run the view again on the primary
+            connections[alias].close()
+            _replica_status.update(alias=alias, available=False, checked_at=time.monotonic())
+        finally:
+            _read_alias.reset(token)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def pin_to_primary(view):
+    """Keep the client's reads on the primary for a short window after a successful write."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        window = getattr(settings, 'REPLICA_READ_YOUR_WRITES_WINDOW', 0)
+        if window and response.status_code < 400 and get_replica_alias():
+            cache.set(get_client_key(request), True, timeout=window)
+        return response
+
+    return wrapper
@@ -0,0 +1,85 @@
+import datetime
+import functools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.urls import reverse
+
+from .models import Order
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Columns returned for every order, in response order
+ORDER_FIELDS = (
+    'id', 'date', 'customer_name', 'customer_phone', 'receiver_name', 'receiver_phone',
+    'product_name', 'address', 'observations', 'status', 'signature',
+)
+# Extra columns read to build derived values
+QUERY_FIELDS = ORDER_FIELDS + ('signature_hash',)
+ID_INDEX = QUERY_FIELDS.index('id')
+DATE_INDEX = QUERY_FIELDS.index('date')
+SIGNATURE_INDEX = QUERY_FIELDS.index('signature')
+SIGNATURE_HASH_INDEX = QUERY_FIELDS.index('signature_hash')
+THUMBNAIL_SIZE = 'small'
+
+_date_field = Order._meta.get_field('date')
+
+
+def format_date(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        # Unsaved instances may still hold the raw payload string
+        value = _date_field.to_python(value)
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+@functools.cache
+def get_signature_image_url_template():
+    # Reverse once and fill the pk in per row, reverse() is too slow for large lists
+    return reverse('order-signature-image', kwargs={'pk': 0}).replace('/0/', '/{pk}/') + '?size={size}'
+
+
+def format_signature_url(pk, signature, content_hash, size):
+    # Accept both stored names and FieldFile instances
+    if not signature:
+        return None
+    url = get_signature_image_url_template().format(pk=pk, size=size)
+    # Versioned URLs can be cached by clients indefinitely
+    return f'{url}&v={content_hash}' if content_hash else url
+
+
+def serialize_row(row):
+    data = dict(zip(ORDER_FIELDS, row))
+    pk, signature, content_hash = row[ID_INDEX], row[SIGNATURE_INDEX], row[SIGNATURE_HASH_INDEX]
+    data['date'] = format_date(row[DATE_INDEX])
+    # Both links go through the signature endpoint, MEDIA_URL is not served
+    data['signature'] = format_signature_url(pk, signature, content_hash, 'original')
+    data['signature_thumbnail'] = format_signature_url(pk, signature, content_hash, THUMBNAIL_SIZE)
+    return data
+
+
+def serialize_orders(queryset):
+    # Read plain tuples so no model instances are built
+    return [serialize_row(row) for row in queryset.values_list(*QUERY_FIELDS)]
+
+
+def serialize_order(order):
+    return serialize_row(tuple(getattr(order, field) for field in QUERY_FIELDS))
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=DjangoJSONEncoder().default)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def json_response(data, status=200):
+    # Drop-in for JsonResponse that uses orjson when it is installed
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
@@ -0,0 +1,170 @@
+import glob
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from PIL import Image, ImageChops
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+# Fixed thumbnail bounding boxes, anything else is rejected
+THUMBNAIL_SIZES = {
+    'small': (160, 80),
+    'medium': (320, 160),
+    'large': (640, 320),
+}
+THUMBNAIL_DIR = 'thumbnails'
+# Bounding box of the signature printed in order PDFs, 3 x 1.5 inches at 300 dpi
+PRINT_IMAGE_SIZE = (900, 450)
+
+
+def get_signature_storage():
+    return Order._meta.get_field('signature').storage
+
+
+def hash_file(file):
+    # Accepts an uploaded file or anything with chunks()
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_path(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_signature_hash(order):
+    # Signatures stored before hashes existed get theirs on first use. The update goes
+    # to the primary even inside @read_from_replica views.
+    if not order.signature_hash:
+        order.signature_hash = hash_path(order.signature.path)
+        Order.objects.filter(pk=order.pk, signature=order.signature.name).update(
+            signature_hash=order.signature_hash
+        )
+    return order.signature_hash
+
+
+def get_thumbnail_dir():
+    upload_to = Order._meta.get_field('signature').upload_to.strip('/')
+    return get_signature_storage().path(os.path.join(upload_to, THUMBNAIL_DIR))
+
+
+def get_thumbnail_path(content_hash, size):
+    # Thumbnails are keyed by content so a replaced signature never reuses a stale one
+    return os.path.join(get_thumbnail_dir(), f'{content_hash}_{size}.png')
+
+
+def save_image_atomically(image, path, format, **options):
+    # Write to a temporary file first so concurrent requests never read a partial image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1], dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, format=format, **options)
+        # mkstemp creates the file as 0600, use upload permissions so a sendfile proxy can read it
+        os.chmod(tmp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_or_create_thumbnail(source_path, content_hash, size):
+    path = get_thumbnail_path(content_hash, size)
+    if os.path.exists(path):
+        return path
+
+    with Image.open(source_path) as image:
+        image.thumbnail(THUMBNAIL_SIZES[size])
+        save_image_atomically(image, path, 'PNG', optimize=True)
+    return path
+
+
+def get_or_create_print_image(source_path, content_hash):
+    # Lossless copy of the signature for PDFs, scaled to print size and flattened onto
+    # white so ReportLab doesn't render transparent pixels black
+    path = os.path.join(get_thumbnail_dir(), f'{content_hash}_print.png')
+    if os.path.exists(path):
+        return path
+
+    with Image.open(source_path) as image:
+        image.thumbnail(PRINT_IMAGE_SIZE)
+        rgba = image.convert('RGBA')
+        flattened = Image.new('RGB', rgba.size, 'white')
+        flattened.paste(rgba, mask=rgba.getchannel('A'))
+        # Black ink needs no colour, grayscale is a third of the data to embed
+        if ImageChops.difference(flattened, flattened.convert('L').convert('RGB')).getbbox() is None:
+            flattened = flattened.convert('L')
+        save_image_atomically(flattened, path, 'PNG', optimize=True)
+    return path
+
+
+def delete_thumbnails(content_hash):
+    if not content_hash or Order.objects.filter(signature_hash=content_hash).exists():
+        return
+    for path in glob.glob(os.path.join(get_thumbnail_dir(), f'{content_hash}_*')):
+        try:
+            os.remove(path)
+        except OSError:
+            logger.exception('Could not delete signature thumbnail %s', path)
+
+
+def delete_signature_file(name, content_hash=None):
+    # Remove a signature file unless another order still points at it
+    if not name or Order.objects.filter(signature=name).exists():
+        return
+    storage = get_signature_storage()
+    try:
+        storage.delete(name)
+    except OSError:
+        logger.exception('Could not delete signature file %s', name)
+    delete_thumbnails(content_hash)
+
+
+# Files waiting to be deleted, drained by a single background worker
+_cleanup_queue = queue.Queue()
+_cleanup_worker = None
+_cleanup_worker_lock = threading.Lock()
+
+
+def run_cleanup_worker():
+    while True:
+        name, content_hash = _cleanup_queue.get()
+        try:
+            close_old_connections()
+            delete_signature_file(name, content_hash)
+        except Exception:
+            logger.exception('Could not clean up signature file %s', name)
+        finally:
+            # The worker lives as long as the process, don't keep its connections open while idle
+            connections.close_all()
+            _cleanup_queue.task_done()
+
+
+def enqueue_signature_cleanup(name, content_hash=None):
+    global _cleanup_worker
+    with _cleanup_worker_lock:
+        if _cleanup_worker is None or not _cleanup_worker.is_alive():
+            _cleanup_worker = threading.Thread(target=run_cleanup_worker, name='signature-cleanup', daemon=True)
+            _cleanup_worker.start()
+    _cleanup_queue.put((name, content_hash))
+
+
+def schedule_signature_cleanup(name, content_hash=None):
+    # Delete the file in the background once the current transaction commits,
+    # so a rollback never leaves an order pointing at a missing file
+    if not name:
+        return
+    transaction.on_commit(lambda: enqueue_signature_cleanup(name, content_hash))
@@ -1,3 +1,407 @@
-from django.test import TestCase
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import stat
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from .addresses import build_address_key, parse_address
+from .idempotency import get_key_ttl, idempotent
+from .models import IdempotencyKey, Order
+from .routers import ReplicaRouter, _replica_status, read_from_replica
+from .serializers import serialize_order
+from .signatures import (
+    delete_signature_file, get_or_create_print_image, get_thumbnail_path, schedule_signature_cleanup
+)
+
+
+ORDER_PAYLOAD = {
+    'date': '2025-11-25',
+    'customer_name': 'Juan Pérez',
+    'customer_phone': '612345678',
+    'receiver_name': 'María García',
+    'receiver_phone': '698765432',
+    'product_name': 'Laptop Dell XPS 15',
+    'address': 'Calle Mayor 45, 3º B, 28013 Madrid',
+}
+
+
+class IdempotencyKeyTests(TestCase):
+    payload = ORDER_PAYLOAD
+
+    def create_order(self, key, payload=None):
+        return self.client.post(
+            '/api/orders/', json.dumps(payload or self.payload),
+            content_type='application/json', headers={'Idempotency-Key': key},
+        )
+
+    def test_repeated_key_replays_stored_response(self):
+        first = self.create_order('order-1')
+        second = self.create_order('order-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.create_order('order-1')
+        response = self.create_order('order-1', {**self.payload, 'product_name': 'Monitor'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_key_runs_the_view_again(self):
+        first = self.create_order('order-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - get_key_ttl() - timedelta(seconds=1))
+        second = self.create_order('order-1')
+
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(second.json()['order_id'], first.json()['order_id'])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_server_errors_are_not_stored(self):
+        calls = []
+
+        @idempotent
+        def failing_view(request):
+            calls.append(request)
+            Order.objects.create(date='2025-11-25', receiver_name='a', receiver_phone=1, address='b')
+            return JsonResponse({'error': 'Unavailable'}, status=503)
+
+        factory = RequestFactory()
+        for _ in range(2):
+            request = factory.post('/api/orders/', '{}', content_type='application/json',
+                                   headers={'Idempotency-Key': 'order-1'})
+            self.assertEqual(failing_view(request).status_code, 503)
+
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        # The view's writes are rolled back along with the key
+        self.assertFalse(Order.objects.exists())
+
+
+class ParseAddressTests(SimpleTestCase):
+    cases = {
+        'Calle Mayor 45, 3º B, 28013 Madrid': ('28013', 'madrid', 'calle mayor'),
+        'Calle Mayor 45, 28013 Madrid': ('28013', 'madrid', 'calle mayor'),
+        'Calle Mayor 45 28013 Madrid': ('28013', 'madrid', 'calle mayor'),
+        'Calle Mayor 45, 28013, Madrid': ('28013', 'madrid', 'calle mayor'),
+        'Calle Mayor 45, Madrid 28013': ('28013', 'madrid', 'calle mayor'),
+        '28013 Madrid, Calle Mayor 45': ('28013', 'madrid', 'calle mayor'),
+        '28013, Madrid, Calle Mayor 45': ('28013', 'madrid', 'calle mayor'),
+        'C/ Mayor 7, 28013 Madrid': ('28013', 'madrid', 'calle mayor'),
+        'Calle Mayor, 45': ('', '', 'calle mayor'),
+        'Calle Mayor 45, 28013': ('28013', '', 'calle mayor'),
+        'Avda. de la Constitución 3\nSevilla': ('', 'sevilla', 'avenida constitucion'),
+        'Calle Madrid 5, 28013 Madrid': ('28013', 'madrid', 'calle madrid'),
+        '': ('', '', ''),
+    }
+
+    def test_parse_address(self):
+        for address, expected in self.cases.items():
+            with self.subTest(address=address):
+                self.assertEqual(parse_address(address), expected)
+
+    def test_migration_backfill_matches_parser(self):
+        migration = importlib.import_module('database_api.migrations.0007_order_address_key')
+        for address in self.cases:
+            with self.subTest(address=address):
+                self.assertEqual(migration.build_address_key(address), build_address_key(address))
+
+
+# A second SQLite database standing in for the replica. It is registered while the tests
+# are collected, so the test runner creates and migrates it like the default database.
+REPLICA = 'test_replica'
+REPLICA_FILE = os.path.join(tempfile.gettempdir(), f'orders_register_api_replica_{os.getpid()}.sqlite3')
+connections.settings.setdefault(REPLICA, {
+    **connections.settings[DEFAULT_DB_ALIAS],
+    'TEST': {**connections.settings[DEFAULT_DB_ALIAS]['TEST'], 'NAME': REPLICA_FILE},
+})
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        patcher = mock.patch('database_api.routers.get_replica_alias', return_value=REPLICA)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        _replica_status.update(alias=None, available=False, checked_at=0.0)
+        cache.clear()
+        Order.objects.create(**{**ORDER_PAYLOAD, 'receiver_name': 'Primary'})
+        Order.objects.using(REPLICA).create(**{**ORDER_PAYLOAD, 'receiver_name': 'Replica'})
+
+    @contextlib.contextmanager
+    def replica_file(self, path):
+        # Point the replica alias at another file for the duration of the block
+        connection = connections[REPLICA]
+        connection.close()
+        original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = path
+        try:
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = original
+
+    def search(self, **extra):
+        response = self.client.get('/api/orders/search/', {'status': Order.Status.PENDING}, **extra)
+        self.assertEqual(response.status_code, 200)
+        return sorted(order['receiver_name'] for order in response.json()['orders'])
+
+    def test_router_sends_only_marked_reads_to_replica(self):
+        router = ReplicaRouter()
+        seen = {}
+
+        @read_from_replica
+        def view(request):
+            seen['read'] = router.db_for_read(Order)
+            seen['write'] = router.db_for_write(Order)
+            return JsonResponse({})
+
+        view(RequestFactory().get('/'))
+        self.assertEqual(seen, {'read': REPLICA, 'write': DEFAULT_DB_ALIAS})
+        self.assertEqual(router.db_for_read(Order), DEFAULT_DB_ALIAS)
+
+    def test_reads_use_replica(self):
+        self.assertEqual(self.search(), ['Replica'])
+
+    def test_client_reads_primary_after_own_write(self):
+        response = self.client.post('/api/orders/', json.dumps(ORDER_PAYLOAD), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.search(), ['María García', 'Primary'])
+        # Other clients keep reading the replica
+        self.assertEqual(self.search(REMOTE_ADDR='10.0.0.2'), ['Replica'])
+
+    def test_missing_replica_falls_back_to_primary(self):
+        path = os.path.join(tempfile.gettempdir(), f'orders_register_api_missing_{os.getpid()}.sqlite3')
+        with self.replica_file(path):
+            self.assertEqual(self.search(), ['Primary'])
+        # The health check must not create an empty SQLite file
+        self.assertFalse(os.path.exists(path))
+
+    def test_replica_failing_after_health_check_falls_back_to_primary(self):
+        with tempfile.NamedTemporaryFile(suffix='.sqlite3') as empty:
+            with self.replica_file(empty.name):
+                # The file exists so the health check passes, but it has no tables
+                self.assertEqual(self.search(), ['Primary'])
+        self.assertFalse(_replica_status['available'])
+
+
+class TemporaryMediaTestCase(TestCase):
+    """Store signatures and thumbnails in a fresh MEDIA_ROOT for every test."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def create_signed_order(self, data, name='signature.png'):
+        order = Order.objects.create(**ORDER_PAYLOAD, signature_hash=hashlib.sha256(data).hexdigest())
+        order.signature.save(name, ContentFile(data))
+        return order
+
+
+class SignatureImageTests(TemporaryMediaTestCase):
+    def setUp(self):
+        super().setUp()
+        buffer = io.BytesIO()
+        Image.new('RGBA', (400, 200), (0, 0, 0, 0)).save(buffer, 'PNG')
+        self.data = buffer.getvalue()
+        self.order = self.create_signed_order(self.data)
+        self.url = f'/api/orders/{self.order.pk}/signature/image/'
+
+    def test_json_links_to_signature_endpoint(self):
+        data = serialize_order(self.order)
+        self.assertEqual(data['signature'], f'{self.url}?size=original&v={self.order.signature_hash}')
+        self.assertEqual(data['signature_thumbnail'], f'{self.url}?size=small&v={self.order.signature_hash}')
+
+    def test_original_is_served_with_etag(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+
+    def test_cached_forever_only_when_version_matches(self):
+        pinned = self.client.get(self.url, {'v': self.order.signature_hash})
+        stale = self.client.get(self.url, {'v': 'outdated'})
+
+        self.assertEqual(pinned['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(stale['Cache-Control'], 'public, no-cache')
+
+    def test_matching_if_none_match_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': f'W/{etag}'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range_returns_partial_content(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.data[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.data)}')
+
+    def test_suffix_range_returns_last_bytes(self):
+        size = len(self.data)
+        response = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.data[-5:])
+        self.assertEqual(response['Content-Range'], f'bytes {size - 5}-{size - 1}/{size}')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(self.data)}-'})
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_range_ignored_when_if_range_does_not_match(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"outdated"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), self.data)
+
+    def test_thumbnail_is_created_readable_by_other_users(self):
+        response = self.client.get(self.url, {'size': 'small'})
+        path = get_thumbnail_path(self.order.signature_hash, 'small')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 80))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+    def test_undecodable_signature_thumbnail_is_rejected(self):
+        order = self.create_signed_order(b'not an image')
+        url = f'/api/orders/{order.pk}/signature/image/'
+
+        self.assertEqual(self.client.get(url, {'size': 'small'}).status_code, 422)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_pdf_stores_missing_signature_hash(self):
+        content_hash = self.order.signature_hash
+        Order.objects.filter(pk=self.order.pk).update(signature_hash='')
+
+        response = self.client.get(f'/api/orders/{self.order.pk}/pdf/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).signature_hash, content_hash)
+
+    def test_print_image_is_lossless(self):
+        signature = Image.new('RGBA', (300, 100), (0, 0, 0, 0))
+        signature.paste((20, 40, 200, 255), (10, 10, 290, 30))
+        path = os.path.join(self.media_root, 'ink.png')
+        signature.save(path)
+
+        with Image.open(get_or_create_print_image(path, 'ink')) as printed:
+            self.assertEqual(printed.format, 'PNG')
+            self.assertEqual(printed.getpixel((0, 0)), (255, 255, 255))
+            self.assertEqual(printed.getpixel((20, 20)), (20, 40, 200))
+
+    @override_settings(SIGNATURE_SENDFILE_MODE='x-accel')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.order.signature.name}')
+
+    @override_settings(SIGNATURE_SENDFILE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], self.order.signature.path)
+
+
+class SignatureCleanupTests(TemporaryMediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_signed_order(b'kept', 'kept.png')
+        self.files = {
+            'kept': self.order.signature.path,
+            'kept_thumbnail': self.write_thumbnail(self.order.signature_hash),
+            'orphan': self.write_signature('orphan.png'),
+            'orphan_thumbnail': self.write_thumbnail('0' * 64),
+        }
+        # Everything is old enough to clean except an upload still in flight
+        for path in self.files.values():
+            os.utime(path, (0, 0))
+        self.files['recent'] = self.write_signature('recent.png')
+
+    def write_signature(self, name):
+        path = os.path.join(self.media_root, 'signatures', name)
+        with open(path, 'wb') as f:
+            f.write(b'orphan')
+        return path
+
+    def write_thumbnail(self, content_hash):
+        path = get_thumbnail_path(content_hash, 'small')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'thumbnail')
+        return path
+
+    def existing(self):
+        return {key for key, path in self.files.items() if os.path.exists(path)}
+
+    def test_dry_run_reports_and_keeps_files(self):
+        out = io.StringIO()
+        call_command('cleanup_signatures', '--dry-run', stdout=out)
+
+        self.assertEqual(self.existing(), set(self.files))
+        self.assertIn('Orphaned: signatures/orphan.png', out.getvalue())
+        self.assertIn(f'Orphaned: signatures/thumbnails/{"0" * 64}_small.png', out.getvalue())
+        self.assertIn('Would remove 2 orphaned files', out.getvalue())
+
+    def test_removes_only_old_unreferenced_files(self):
+        call_command('cleanup_signatures', '--min-age', '60', stdout=io.StringIO())
+
+        self.assertEqual(self.existing(), {'kept', 'kept_thumbnail', 'recent'})
+
+    def test_delete_signature_file_keeps_files_still_referenced(self):
+        name, content_hash = self.order.signature.name, self.order.signature_hash
+        other = Order.objects.create(**ORDER_PAYLOAD, signature=name, signature_hash=content_hash)
+
+        self.order.delete()
+        delete_signature_file(name, content_hash)
+        self.assertTrue({'kept', 'kept_thumbnail'} <= self.existing())
+
+        other.delete()
+        delete_signature_file(name, content_hash)
+        self.assertFalse({'kept', 'kept_thumbnail'} & self.existing())
+
+    def test_cleanup_is_queued_only_on_commit(self):
+        name, content_hash = self.order.signature.name, self.order.signature_hash
+        with mock.patch('database_api.signatures.enqueue_signature_cleanup') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_signature_cleanup(name, content_hash)
+                enqueue.assert_not_called()
+
+        enqueue.assert_called_once_with(name, content_hash)
@@ -8,6 +8,8 @@ urlpatterns = [
     path('orders/search/', views.search_orders, name='order-search'),          # GET => search with query params
     path('orders/<int:pk>/pdf/', views.generate_order_pdf, name='order-pdf'),  # GET => download PDF
     path('orders/<int:pk>/signature/', views.upload_signature, name='order-signature'),  # PATCH => upload signature
+    path('orders/<int:pk>/signature/image/', views.signature_image, name='order-signature-image'),  # GET => signature or thumbnail
     path('orders/<int:pk>/delete/', views.delete_order, name='order-delete'),   # DELETE => delete order
+    path('orders/routes/', views.order_routes, name='order-routes'),          # GET => open orders grouped by address
     path('orders/excel/', views.export_orders_excel, name='order-excel'),  # GET => export to Excel
 ]
\ No newline at end of file
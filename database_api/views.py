@@ -1,25 +1,39 @@
+import itertools
 import json
+import mimetypes
 import os
+import re
 import urllib.request
 import datetime
 
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Count, Q
+from .addresses import split_address_key
+from .idempotency import idempotent
 from .models import Order
+from .pdf import render_order_pdf
+from .routers import pin_to_primary, read_from_replica
+from .serializers import json_response, serialize_order, serialize_orders
+from .signatures import (
+    THUMBNAIL_SIZES, get_or_create_thumbnail, get_signature_hash, hash_file, schedule_signature_cleanup
+)
 from django.shortcuts import get_object_or_404
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
 from reportlab.lib.colors import white
 from io import BytesIO
 from reportlab.lib.utils import ImageReader
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
+from PIL import Image, UnidentifiedImageError
 
 REQUIRED_FIELDS = ['receiver_name', 'address', 'receiver_phone', 'customer_name']
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
 
 @csrf_exempt
+@read_from_replica
 def export_orders_excel(request):
     """Export all orders to Excel file"""
     if request.method != 'GET':
@@ -153,6 +167,7 @@ def parse_date(value):
                 return None
     return value
 
+@read_from_replica
 def generate_order_pdf(request, pk):
     # Get order or return 404
     order = get_object_or_404(Order, id=pk)
@@ -161,107 +176,8 @@ def generate_order_pdf(request, pk):
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="pedido_{pk}.pdf"'
     
-    # Create PDF
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    
-    # Header with nice styling
-    p.setFont("Helvetica-Bold", 24)
-    p.drawString(1*inch, height - 0.8*inch, "INFORME DE PEDIDO")
-    
-    # Underline
-    p.line(1*inch, height - 0.9*inch, width - 1*inch, height - 0.9*inch)
-    
-    # Pedido number
-    p.setFont("Helvetica", 14)
-    p.drawString(1*inch, height - 1.2*inch, f"Pedido #{order.id}")
-    
-    # Order details
-    p.setFont("Helvetica", 12)
-    y = height - 1.6*inch
-    
-    # Format date properly
-    date_str = order.date.strftime('%d-%m-%Y') if order.date else 'N/A'
-    p.drawString(1*inch, y, f"Fecha: {date_str}")
-    y -= 0.3*inch
-    
-    # Status display
-    status_display = order.get_status_display() if hasattr(order, 'get_status_display') else order.status
-    p.drawString(1*inch, y, f"Estado: {status_display}")
-    y -= 0.5*inch
-    
-    # Customer info
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(1*inch, y, "Información del Cliente")
-    y -= 0.3*inch
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(1*inch, y, f"Nombre: {order.customer_name or 'N/A'}")
-    y -= 0.25*inch
-    
-    # Format phone number properly
-    customer_phone = f"{order.customer_phone}" if order.customer_phone else 'N/A'
-    p.drawString(1*inch, y, f"Teléfono: {customer_phone}")
-    y -= 0.5*inch
-    
-    # Receiver info
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(1*inch, y, "Información del Destinatario")
-    y -= 0.3*inch
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(1*inch, y, f"Nombre: {order.receiver_name}")
-    y -= 0.25*inch
-    
-    # Format phone number properly
-    receiver_phone = f"{order.receiver_phone}" if order.receiver_phone else 'N/A'
-    p.drawString(1*inch, y, f"Teléfono: {receiver_phone}")
-    y -= 0.25*inch
-    p.drawString(1*inch, y, f"Dirección: {order.address}")
-    y -= 0.5*inch
-    
-    # Product info
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(1*inch, y, "Producto")
-    y -= 0.3*inch
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(1*inch, y, f"{order.product_name or 'N/A'}")
-    y -= 0.5*inch
-    
-    # Observations (kept as 'observations' - correct field name)
-    if order.observations:
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(1*inch, y, "Observaciones")
-        y -= 0.3*inch
-        
-        p.setFont("Helvetica", 12)
-        # Handle long text (wrap if needed)
-        p.drawString(1*inch, y, order.observations[:100])  # Limit length
-        y -= 0.5*inch
-    
-    # Signature with error handling
-    if order.signature:
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(1*inch, y, "Firma del Cliente")
-        y -= 0.3*inch
-        
-        try:
-            # Handle both local and remote storage
-            if hasattr(order.signature, 'path') and os.path.exists(order.signature.path):
-                # Local storage
-                p.drawImage(order.signature.path, 1*inch, y - 2*inch, width=3*inch, height=1.5*inch)
-            else:
-                # Remote storage or file not found
-                p.setFont("Helvetica-Oblique", 10)
-                p.drawString(1*inch, y - 0.5*inch, "[Firma disponible en el sistema]")
-        except Exception as e:
-            # Handle any image loading errors
-            p.setFont("Helvetica-Oblique", 10)
-            p.drawString(1*inch, y - 0.5*inch, f"[Error cargando firma: {str(e)}]")
-    
-    p.showPage()
-    p.save()
+    # Render the order sheet
+    render_order_pdf(order, response)
     
     return response
 
@@ -276,6 +192,8 @@ def parse_phone(value):
         return None
 
 @csrf_exempt
+@pin_to_primary
+@idempotent
 def create_order(request):
     # Check for correct HTTP method
     if request.method != 'POST':
@@ -308,9 +226,10 @@ def create_order(request):
         signature=payload.get('signature', None)
     )
 
-    return JsonResponse({'order_id': order.pk}, status=201)
+    return json_response({'order_id': order.pk, 'order': serialize_order(order)}, status=201)
 
 @csrf_exempt
+@pin_to_primary
 def update_order(request, pk):
     # Check for correct HTTP method
     if request.method not in ('PATCH', 'PUT'):
@@ -350,21 +269,9 @@ def update_order(request, pk):
 
     order.save()
 
-    data = {
-        'id': order.pk,
-        'date': order.date.isoformat() if order.date else None,
-        'customer_name': order.customer_name,
-        'customer_phone': order.customer_phone,
-        'receiver_phone': order.receiver_phone,
-        'receiver_name': order.receiver_name,
-        'product_name': order.product_name,
-        'address': order.address,
-        'observations': order.observations,
-        'status': order.status,
-        'signature': order.signature.url if order.signature else None,
-    }
-    return JsonResponse({'order': data})
+    return json_response({'order': serialize_order(order)})
 
+@read_from_replica
 def search_orders(request):
     # Check for correct HTTP method
     if request.method != 'GET':
@@ -394,9 +301,49 @@ def search_orders(request):
             except ValueError:
                 return JsonResponse({'error': 'Formato de fecha inválido. Use DD-MM.'}, status=400)
         
-    return JsonResponse({'orders': list(orders.values())})
+    return json_response({'orders': serialize_orders(orders)})
+
+@read_from_replica
+def order_routes(request):
+    # Check for correct HTTP method
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    # Group open orders by their precomputed address key, counts and ids in one query each
+    open_statuses = [Order.Status.PENDING, Order.Status.PROCESSING]
+    open_orders = Order.objects.filter(status__in=open_statuses)
+    groups = (
+        open_orders
+        .values('address_key')
+        .annotate(
+            count=Count('id'),
+            pending=Count('id', filter=Q(status=Order.Status.PENDING)),
+            processing=Count('id', filter=Q(status=Order.Status.PROCESSING)),
+        )
+        .order_by('address_key')
+    )
+    rows = open_orders.values_list('address_key', 'id').order_by('address_key', 'id')
+    order_ids = {
+        key: [order_id for _, order_id in group]
+        for key, group in itertools.groupby(rows.iterator(), key=lambda row: row[0])
+    }
+
+    routes = [
+        {
+            'key': group['address_key'],
+            **split_address_key(group['address_key']),
+            'count': group['count'],
+            'pending': group['pending'],
+            'processing': group['processing'],
+            'order_ids': order_ids.get(group['address_key'], []),
+        }
+        for group in groups
+    ]
+    return JsonResponse({'routes': routes})
 
 @csrf_exempt
+@pin_to_primary
+@idempotent
 def upload_signature(request, pk):
     # Check for correct HTTP method
     if request.method not in ('POST', 'PUT', 'PATCH'):
@@ -410,12 +357,109 @@ def upload_signature(request, pk):
         return JsonResponse({'error': 'No signature file provided'}, status=400)
 
     # Save the signature file
+    previous_signature = order.signature.name if order.signature else None
+    previous_hash = order.signature_hash
     order.signature = request.FILES['signature']
+    order.signature_hash = hash_file(request.FILES['signature'])
     order.save()
 
+    # Remove the replaced file once the new one is committed
+    if previous_signature and previous_signature != order.signature.name:
+        schedule_signature_cleanup(previous_signature, previous_hash)
+
     return JsonResponse({'message': 'Signature uploaded successfully'})
 
+def signature_image(request, pk):
+    # Check for correct HTTP method
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    # Retrieve the order or return 404
+    order = get_object_or_404(Order.objects.only('id', 'signature', 'signature_hash'), pk=pk)
+    if not order.signature or not os.path.exists(order.signature.path):
+        return JsonResponse({'error': 'Order has no signature'}, status=404)
+
+    size = request.GET.get('size', 'original')
+    if size != 'original' and size not in THUMBNAIL_SIZES:
+        return JsonResponse({'error': f'Invalid size, use one of: original, {", ".join(THUMBNAIL_SIZES)}'}, status=400)
+
+    content_hash = get_signature_hash(order)
+
+    if size == 'original':
+        path = order.signature.path
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    else:
+        try:
+            path = get_or_create_thumbnail(order.signature.path, content_hash, size)
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            # The stored file is not an image Pillow can safely decode
+            return JsonResponse({'error': 'Signature image cannot be resized'}, status=422)
+        content_type = 'image/png'
+
+    return serve_signature_file(request, path, content_type, content_hash, size)
+
+def serve_signature_file(request, path, content_type, content_hash, size):
+    etag = quote_etag(f'{content_hash[:32]}-{size}')
+
+    # Only URLs pinned to the current content may be cached forever
+    if request.GET.get('v') == content_hash:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, no-cache'
+
+    client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+    if '*' in client_etags or etag in client_etags:
+        response = HttpResponse(status=304)
+    elif settings.SIGNATURE_SENDFILE_MODE == 'x-accel':
+        # Let nginx send the bytes from an internal location mapped to MEDIA_ROOT
+        response = HttpResponse(content_type=content_type)
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.SIGNATURE_SENDFILE_URL.rstrip('/') + '/' + relative_path
+    elif settings.SIGNATURE_SENDFILE_MODE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = file_range_response(request, path, content_type, etag)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+def file_range_response(request, path, content_type, etag):
+    # Serve a file, honouring a single "Range: bytes=start-end" request
+    file_size = os.path.getsize(path)
+    match = RANGE_RE.fullmatch(request.headers.get('Range', '').strip())
+    if_range = request.headers.get('If-Range')
+    if not match or (if_range and if_range != etag) or not any(match.groups()):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        start = max(file_size - int(end), 0)
+        end = file_size - 1
+    else:
+        start = int(start)
+        end = min(int(end), file_size - 1) if end else file_size - 1
+
+    if start > end or start >= file_size:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{file_size}'
+        return response
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start + 1)
+
+    response = HttpResponse(data, status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
 @csrf_exempt
+@pin_to_primary
 def delete_order(request, pk):
     # Check for correct HTTP method
     if request.method != 'DELETE':
@@ -424,7 +468,10 @@ def delete_order(request, pk):
     # Retrieve the order or return 404
     order = get_object_or_404(Order, pk=pk)
     
-    # Delete the order
+    # Delete the order and its signature file after commit
+    signature_name = order.signature.name if order.signature else None
+    signature_hash = order.signature_hash
     order.delete()
+    schedule_signature_cleanup(signature_name, signature_hash)
     
     return JsonResponse({'message': 'Order deleted successfully'})
\ No newline at end of file
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -83,6 +84,39 @@ DATABASES = {
     }
 }
 
+# Optional read replica for search, Excel export and PDF generation.
+# Locally, point DB_REPLICA_NAME at a copy of db.sqlite3 (or set DB_REPLICA_ENGINE
+# and the connection variables for a Postgres replica).
+REPLICA_DATABASE_ALIAS = 'replica'
+
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        'ENGINE': os.environ.get('DB_REPLICA_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ['DB_REPLICA_NAME'],
+        'USER': os.environ.get('DB_REPLICA_USER', ''),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', ''),
+        'HOST': os.environ.get('DB_REPLICA_HOST', ''),
+        'PORT': os.environ.get('DB_REPLICA_PORT', ''),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['database_api.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after its own write
+REPLICA_READ_YOUR_WRITES_WINDOW = 5
+
+# The read-your-writes pins must be visible to every gunicorn worker, so they live in
+# a cache table on the primary (created with "manage.py createcachetable")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+# Seconds a stored Idempotency-Key response is replayed for
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,8 +152,6 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
-import os
-
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
@@ -127,6 +159,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# How /api/orders/<pk>/signature/image/ sends file bytes: None streams them from
+# Django, 'x-accel' hands off to nginx via SIGNATURE_SENDFILE_URL (an internal
+# location aliased to MEDIA_ROOT) and 'x-sendfile' to Apache/lighttpd.
+SIGNATURE_SENDFILE_MODE = os.environ.get('SIGNATURE_SENDFILE_MODE') or None
+SIGNATURE_SENDFILE_URL = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 